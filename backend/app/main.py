@@ -1,7 +1,7 @@
 ﻿import asyncio
-import random
+import json
 import sys
-from collections import defaultdict, deque
+from collections import defaultdict
 from contextlib import asynccontextmanager
 
 if sys.platform == "win32":
@@ -16,12 +16,22 @@ from sqlalchemy import text
 from app.db import engine
 from app.api import router as entities_router
 
-from app.methods import METHODS, FFT_WINDOW_SIZE, LOF_WINDOW_SIZE, Z_SCORE_WINDOW_SIZE
-from app.utils.data_utils import parse_data, filter_required_parameters
+from app.methods import (
+    METHODS,
+    MIN_WINDOW,
+    FFT_WINDOW_SIZE,
+    LOF_WINDOW_SIZE,
+    Z_SCORE_WINDOW_SIZE,
+    Z_SCORE_THRESHOLD,
+)
+from app.utils.data_utils import load_default_data, parse_and_filter_cached
 from app.utils.analysis_utils import (
     AnalysisState,
+    RingBuffer,
+    analyze_record,
     handle_websocket_message,
-    apply_analysis_method,
+    min_filled_for,
+    z_score_fast,
 )
 
 from app.models.base import Base
@@ -63,48 +73,80 @@ async def analyze_file(
         method_params["score_threshold"] = score_threshold
     
     text = await file.read()
-    parsed_data = await parse_data(text, DEFAULT_FILENAME)
-    
+    # Повторная загрузка того же файла (смена метода в UI) не парсит его заново
+    parsed_data = parse_and_filter_cached(text, DEFAULT_FILENAME)
+
     if parsed_data is None:
         return JSONResponse(
             content={"error": 'Столбец "Время" обязателен в файле'},
             status_code=400
         )
-    
-    parsed_data = filter_required_parameters(parsed_data)
 
     data = [{} for _ in range(len(parsed_data))]
-    deque_length = (window_size if window_size and window_size >= 0 else DEFAULT_WINDOWS_SIZE) + 1
-    prev = defaultdict(lambda: deque(maxlen=deque_length))
-    
+
+    # Пока буфер короче этого значения, метод гарантированно вернет False — не вызываем его
+    min_filled = min_filled_for(method, method_params.get("window_size"))
+
+    # Буфер держим ровно той длины, которая нужна методу
+    if min_filled is not None:
+        buffer_length = min_filled
+    else:
+        buffer_length = (window_size if window_size and window_size >= 0 else DEFAULT_WINDOWS_SIZE) + 1
+    prev = defaultdict(lambda: RingBuffer(buffer_length))
+
     # Счётчик аномалий
     total_anomalies = 0
 
+    # Быстрый путь Z-score: O(1) по инкрементным суммам буфера
+    z_fast_window = None
+    z_fast_threshold = None
+    if method == "z_score":
+        z_fast_window = method_params.get("window_size", Z_SCORE_WINDOW_SIZE)
+        z_fast_threshold = method_params.get("score_threshold", Z_SCORE_THRESHOLD)
+
+    # Специализация пути под метод: диспетчеризация и параметры готовятся один раз,
+    # а не на каждую ячейку (запись x канал)
+    fn = METHODS[method]
+    needs_param_name = (method == "ammad")
+    per_key_kwargs = {}  # для AMMAD: {канал: параметры с param_name}, заполняется лениво
+
     for i, record in enumerate(parsed_data):
-        tasks = []
-        time = record.pop("время")
-        
-        # Собираем ключи, чтобы сохранить порядок после gather
-        keys = list(record.keys())
-        
+        # ВАЖНО: записи приходят из кэша и могут переиспользоваться — не мутируем их
+        time = record.get("время")
+
+        keys = [k for k in record if k != "время"]
+        results = {}
+
         for key in keys:
             value = record[key]
             prev[key].append(value)
-            
-            # Подготовка параметров для метода
-            current_params = method_params.copy()
-            if method == "ammad":
-                current_params["param_name"] = key
-            
-            # ВАЖНО: передаем list(prev[key]), так как deque не поддерживает срезы в методах
-            tasks.append(METHODS[method](data=list(prev[key]), **current_params))
-            
-        # Выполняем анализ всех параметров для текущей строки одновременно
-        results = await asyncio.gather(*tasks)
-        
-        for j, key in enumerate(keys):
-            is_anomaly = bool(results[j]) # Приводим к bool для безопасности JSON
-            data[i][key] = [record[key], is_anomaly]
+
+            # Окно еще не заполнено — анализ бессмысленен
+            if min_filled is not None and len(prev[key]) < min_filled:
+                results[key] = False
+                continue
+
+            # Z-score считается за O(1) по инкрементным суммам без прохода по окну
+            if z_fast_window is not None and prev[key].filled == z_fast_window + 1:
+                results[key] = z_score_fast(prev[key], z_fast_window, z_fast_threshold)
+                continue
+
+            # Параметры уже подготовлены выше; для AMMAD добавляем param_name один раз на канал
+            if needs_param_name:
+                current_params = per_key_kwargs.get(key)
+                if current_params is None:
+                    current_params = per_key_kwargs[key] = {**method_params, "param_name": key}
+            else:
+                current_params = method_params
+
+            # Передаем значения хронологически упорядоченным float32-массивом.
+            # Детекторы — чистый CPU-код, прямой вызов без планирования корутин
+            results[key] = fn(data=prev[key].as_array(), **current_params)
+
+        for key in keys:
+            is_anomaly = bool(results[key]) # Приводим к bool для безопасности JSON
+            # float(): записи хранят np.float32, который stdlib json не умеет
+            data[i][key] = [float(record[key]), is_anomaly]
             
             # Если обнаружена аномалия, увеличиваем счетчик
             if is_anomaly:
@@ -120,67 +162,88 @@ async def analyze_file(
     }
 
 
+def _render_ws_frame(data, template_cache):
+    """Сериализует кадр {"data": ...} по заранее собранному JSON-шаблону.
+
+    Форма кадра одинакова от тика к тику (меняются только числа и флаги),
+    поэтому скелет JSON кодируется один раз на набор ключей, а дальше
+    подставляются только значения — без полного обхода dict в json.dumps.
+    """
+    keys = tuple(data.keys())
+    template = template_cache.get(keys)
+    if template is None:
+        parts = [f"{json.dumps(key, ensure_ascii=False)}:%s" for key in keys]
+        template = '{"data":{' + ",".join(parts) + "}}"
+        template_cache[keys] = template
+
+    args = []
+    for key in keys:
+        value = data[key]
+        if isinstance(value, list):  # [значение, флаг аномалии]
+            args.append(f'[{float(value[0])!r},{"true" if value[1] else "false"}]')
+        else:  # время
+            args.append(repr(float(value)))
+    return template % tuple(args)
+
+
+async def _receive_loop(ws: WebSocket, rx_queue: asyncio.Queue):
+    """Фоновый прием сообщений клиента.
+
+    Складывает сообщения в очередь, чтобы основному циклу не приходилось
+    поллить receive_text с таймаутом (создание + отмена Task на каждый тик).
+    None в очереди означает разрыв соединения.
+    """
+    try:
+        while True:
+            rx_queue.put_nowait(await ws.receive_text())
+    except WebSocketDisconnect:
+        rx_queue.put_nowait(None)
+    except Exception as e:
+        print(f"[WebSocket] Ошибка при получении сообщения: {e}")
+        rx_queue.put_nowait(None)
+
+
 @router.websocket("/ws")
 async def websocket_endpoint(ws: WebSocket):
     """WebSocket endpoint для обнаружения аномалий в реальном времени."""
     await ws.accept()
-    
+
     # Инициализация состояния анализа
     analysis_state = AnalysisState(default_window_size=DEFAULT_WINDOWS_SIZE)
-    
+
+    # Фоновая задача приема сообщений вместо поллинга с таймаутом
+    rx_queue = asyncio.Queue()
+    rx_task = asyncio.create_task(_receive_loop(ws, rx_queue))
+
+    # Кэш JSON-шаблонов кадра по набору ключей записи
+    frame_templates = {}
+
     try:
         parsed_data = app.state.default_data
         record_index = 0
-
-        while True:
-            try:
-                # Проверка новых сообщений от клиента (неблокирующая)
-                message_data = await asyncio.wait_for(ws.receive_text(), timeout=0.01)
+        disconnected = False
+
+        while not disconnected:
+            # Обрабатываем накопившиеся сообщения клиента (без блокировки)
+            while not rx_queue.empty():
+                message_data = rx_queue.get_nowait()
+                if message_data is None:
+                    disconnected = True
+                    break
                 await handle_websocket_message(message_data, analysis_state)
 
-            except asyncio.TimeoutError:
-                # Нет новых сообщений, продолжаем отправку данных
-                pass
-            except WebSocketDisconnect:
-                break
-            except Exception as e:
-                print(f"[WebSocket] Ошибка при получении сообщения: {e}")
+            if disconnected:
                 break
 
-            # Обработка текущей записи данных
+            # Обработка текущей записи данных: один вызов на все каналы
             if record_index < len(parsed_data):
-                record = parsed_data[record_index]
-                data = {}
-
-                for key, value in record.items():
-                    if key.lower() == "время":
-                        data[key] = value
-                        continue
-
-                    # Добавляем значение в буфер
-                    analysis_state.data_buffers[key].append(value)
-
-                    # Применяем метод анализа
-                    if len(analysis_state.data_buffers[key]) >= 2:
-                        # Для AMMAD метода передаем имя параметра
-                        method_params = analysis_state.get_method_params()
-                        if analysis_state.method == "ammad":
-                            method_params["param_name"] = key
-                            
-                        is_anomaly = await apply_analysis_method(
-                            key,
-                            analysis_state.data_buffers[key],
-                            analysis_state.method,
-                            method_params
-                        )
-                        data[key] = [value, is_anomaly]
-                    else:
-                        data[key] = [value, False]
+                data = analyze_record(parsed_data[record_index], analysis_state)
 
                 try:
-                    await ws.send_json({"data": data})
+                    await ws.send_text(_render_ws_frame(data, frame_templates))
                     record_index += 1
-                    await asyncio.sleep(random.uniform(1, 3))
+                    if analysis_state.tick_interval > 0:
+                        await asyncio.sleep(analysis_state.tick_interval)
                 except WebSocketDisconnect:
                     break
                 except Exception as e:
@@ -194,6 +257,7 @@ async def websocket_endpoint(ws: WebSocket):
     except Exception as e:
         print(f"[WebSocket] Ошибка соединения: {e}")
     finally:
+        rx_task.cancel()
         print("[WebSocket] Соединение закрыто")
 
 
@@ -207,10 +271,9 @@ async def lifespan(app: FastAPI):
         await conn.run_sync(Base.metadata.create_all)
     print("[DB] Таблицы проверены/созданы")
 
-    # Загрузка дефолтных данных
+    # Загрузка дефолтных данных (с дисковым кэшем между рестартами)
     try:
-        raw_data = await parse_data() # Убедись, что путь к файлу внутри верный
-        app.state.default_data = filter_required_parameters(raw_data) if raw_data else []
+        app.state.default_data = load_default_data()
         print(f"[StartUp] Загружено {len(app.state.default_data)} записей")
     except Exception as e:
         print(f"[StartUp] Ошибка загрузки данных: {e}")
@@ -1,7 +1,21 @@
-from collections import deque
+import math
 from typing import Dict
 import numpy as np
 
+try:
+    # pocketfft из scipy быстрее numpy.fft на коротких окнах (кэш twiddle-таблиц)
+    from scipy.fft import rfft
+except ImportError:
+    from numpy.fft import rfft
+
+try:
+    # numba не обязательна: при ее отсутствии LOF работает по матричному
+    # numpy-пути, с ней — по скомпилированному ядру без временных матриц
+    from numba import njit, prange
+except ImportError:
+    njit = None
+    prange = range
+
 # ==================== КОНСТАНТЫ ====================
 
 Z_SCORE_THRESHOLD = 3.0
@@ -17,6 +31,16 @@ AMMAD_WINDOW_SIZE = 32
 K_LOF = 5
 EPS = 1e-10
 
+# Минимальное окно, начиная с которого метод вообще может вернуть аномалию.
+# Используется вызывающим кодом, чтобы не дергать метод впустую, пока буфер не заполнен.
+# AMMAD здесь сознательно отсутствует: он копит собственную историю и должен
+# вызываться с первого же значения.
+MIN_WINDOW = {
+    "z_score": Z_SCORE_WINDOW_SIZE,
+    "lof": LOF_WINDOW_SIZE,
+    "fft": FFT_WINDOW_SIZE,
+}
+
 # Физические пределы, адаптированные под статистику (убираем приборный шум < 0)
 SAFETY_LIMITS = {
     "скорость_спо": {"min": -0.1, "max": 2.5, "critical": 2.0},      # Факт макс: 1.75
@@ -33,56 +57,383 @@ SAFETY_LIMITS = {
     "глубина": {"min": 0, "max": 10000, "critical": 9000},
 }
 
+# ==================== КОЛЬЦЕВОЙ БУФЕР ====================
+
+class RingBuffer:
+    """Fixed-capacity ring buffer over a contiguous float32 array.
+
+    Values are downcast to float32 on ingest: sensor telemetry has at most
+    5-6 significant digits, so this is lossless for scoring while halving
+    the memory footprint of the analysis window versus float64 (and ~7x
+    versus boxed Python floats in a deque).
+    """
+
+    __slots__ = ("capacity", "_buf", "_head", "filled", "_sum", "_sumsq")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._buf = np.empty(capacity, dtype=np.float32)
+        self._head = 0  # позиция следующей записи
+        self.filled = 0
+        # Инкрементные суммы для O(1) скользящих mean/var. Накопление в
+        # float64 от float32-значений точное, поэтому вычитание при
+        # вытеснении не накапливает дрейф.
+        self._sum = 0.0
+        self._sumsq = 0.0
+
+    def __len__(self) -> int:
+        return self.filled
+
+    def append(self, value: float):
+        if self.filled == self.capacity:
+            evicted = float(self._buf[self._head])
+            self._sum -= evicted
+            self._sumsq -= evicted * evicted
+        self._buf[self._head] = value  # приведение к float32 при записи
+        stored = float(self._buf[self._head])
+        self._sum += stored
+        self._sumsq += stored * stored
+        self._head = (self._head + 1) % self.capacity
+        if self.filled < self.capacity:
+            self.filled += 1
+
+    def last(self) -> float:
+        return float(self._buf[(self._head - 1) % self.capacity])
+
+    def window_stats(self) -> tuple:
+        """O(1) mean/std of all values except the most recent one."""
+        n = self.filled - 1
+        last = self.last()
+        s = self._sum - last
+        s2 = self._sumsq - last * last
+        mean = s / n
+        var = max(s2 / n - mean * mean, 0.0)
+        return mean, var ** 0.5
+
+    def as_array(self) -> np.ndarray:
+        """Values in chronological order (view until the buffer wraps)."""
+        if self.filled < self.capacity:
+            return self._buf[:self._head]
+        return np.concatenate((self._buf[self._head:], self._buf[:self._head]))
+
+
 # ==================== ОРИГИНАЛЬНЫЕ МЕТОДЫ ====================
 
-async def z_score(data, window_size=Z_SCORE_WINDOW_SIZE, score_threshold=Z_SCORE_THRESHOLD):
-    data_list = list(data)
-    if len(data_list) <= window_size: return False
-    window = data_list[-window_size - 1:-1]
-    current_value = data_list[-1]
-    
-    mean, std = np.mean(window), np.std(window)
+def z_score(data, window_size=Z_SCORE_WINDOW_SIZE, score_threshold=Z_SCORE_THRESHOLD):
+    # np.asarray: для ndarray-входа нулевое копирование, для списков — одна конвертация;
+    # срез окна дальше — view без копий
+    arr = np.asarray(data)
+    if arr.size <= window_size: return False
+    window = arr[-window_size - 1:-1]
+    current_value = arr[-1]
+
+    # einsum сплавляет квадрат и редукцию в один проход без временного
+    # массива (x - mean); накопление в float64, чтобы разность s2/n - mean^2
+    # не теряла точность на каналах с большим средним (глубина и т.п.)
+    mean = float(window.mean(dtype=np.float64))
+    s2 = float(np.einsum("i,i->", window, window, dtype=np.float64))
+    var = s2 / window.size - mean * mean
+    std = math.sqrt(var) if var > 0.0 else 0.0
     # Защита от "мертвого нуля": если std ничтожно мал, игнорируем шум датчика
-    if std < 0.01: return False 
-    
-    return bool(abs((current_value - mean) / std) > score_threshold)
+    if std < 0.01: return False
 
-async def lof(data, window_size=LOF_WINDOW_SIZE, score_threshold=LOF_SCORE_THRESHOLD):
-    data_list = list(data)
-    if len(data_list) <= window_size: return False
-    window = data_list[-window_size - 1:-1]
-    last_value = data_list[-1]
-    
-    if all(abs(v - window[0]) < EPS for v in window) and abs(last_value - window[0]) < EPS:
-        return False
-
-    def local_reach_density(point, arr, k=K_LOF):
-        distances = sorted([abs(x - point) for x in arr if x != point])
-        if not distances: return 1.0
-        k_dist = distances[k-1] if len(distances) >= k else distances[-1]
-        reach_dists = [max(abs(point - x), k_dist) for x in arr if x != point][:k]
-        return 1.0 / max(np.mean(reach_dists), EPS)
-
-    lrd_current = local_reach_density(last_value, window)
-    distances = sorted([(i, abs(x - last_value)) for i, x in enumerate(window)], key=lambda x: x[1])
-    k_nearest_indices = [idx for idx, _ in distances[:K_LOF]]
-    neighbor_lrds = [local_reach_density(window[idx], window) for idx in k_nearest_indices]
-    
-    if not neighbor_lrds or lrd_current < EPS: return False
-    return bool((np.mean(neighbor_lrds) / lrd_current) > score_threshold)
+    # |z| > thr в виде |x - mean| > thr * std: умножение вместо деления
+    return bool(abs(current_value - mean) > score_threshold * std)
+
+def z_score_batch(windows, window_size=Z_SCORE_WINDOW_SIZE, score_threshold=Z_SCORE_THRESHOLD) -> np.ndarray:
+    """Пакетный z_score() для матрицы окон (P, n) — по строке на канал.
+
+    Одна пара редукций mean/std по axis=1 вместо P отдельных вызовов;
+    результаты построчно совпадают с z_score(), включая защиту от
+    \"мертвого нуля\" (std < 0.01).
+    """
+    m = np.asarray(windows, dtype=np.float64)
+    if m.shape[1] <= window_size:
+        return np.zeros(m.shape[0], dtype=bool)
+    w = m[:, -window_size - 1:-1]
+    mean = w.mean(axis=1)
+    std = w.std(axis=1)
+    live = std >= 0.01
+    z = np.zeros(m.shape[0])
+    np.divide(np.abs(m[:, -1] - mean), std, out=z, where=live)
+    return (z > score_threshold) & live
+
+
+def _local_reach_densities(points, arr, k=K_LOF):
+    """Векторизованный расчет локальной плотности достижимости для набора точек.
+
+    Повторяет семантику скалярной версии: значения arr, равные точке,
+    исключаются; k-дистанция — k-е по возрастанию из оставшихся расстояний
+    (или максимальное, если их меньше k); reach-расстояния — первые k
+    валидных в исходном порядке. Для точки без валидных соседей lrd = 1.0.
+    """
+    D = np.abs(arr[None, :] - points[:, None])
+    valid = arr[None, :] != points[:, None]
+    counts = valid.sum(axis=1)
+
+    # k-дистанция: нужны только k наименьших на строку, поэтому introselect
+    # (O(N)) вместо полной сортировки (O(N log N)); невалидные уходят в +inf
+    kth = tuple(range(min(k, D.shape[1])))
+    d_part = np.partition(np.where(valid, D, np.inf), kth, axis=1)
+    k_idx = np.minimum(k, np.maximum(counts, 1)) - 1
+    k_dist = d_part[np.arange(len(points)), k_idx]
+
+    # Первые k валидных расстояний в исходном порядке
+    first_k = valid & (np.cumsum(valid, axis=1) <= k)
+    reach = np.maximum(D, k_dist[:, None])
+    reach_sum = np.where(first_k, reach, 0.0).sum(axis=1)
+
+    lrd = np.ones(len(points))
+    has_neighbors = counts > 0
+    mean_reach = reach_sum[has_neighbors] / first_k.sum(axis=1)[has_neighbors]
+    lrd[has_neighbors] = 1.0 / np.maximum(mean_reach, EPS)
+    return lrd
+
+
+def _lof_lrds_kernel(window, last, k, eps):
+    """Скомпилированное ядро LOF: (средний lrd k соседей, lrd текущей точки).
+
+    Повторяет семантику _local_reach_densities + stable-выбора соседей
+    поэлементными циклами — numba компилирует их в машинный код без
+    аллокации матрицы W x W на вызов.
+    """
+    n = window.shape[0]
+    lrd = np.empty(n + 1)
+    kbuf = np.empty(k)
+    for i in range(n + 1):
+        p = window[i] if i < n else last
+        # k наименьших валидных расстояний (замещение текущего максимума)
+        kcnt = 0
+        count = 0
+        for j in range(n):
+            if window[j] == p:
+                continue
+            count += 1
+            d = abs(window[j] - p)
+            if kcnt < k:
+                kbuf[kcnt] = d
+                kcnt += 1
+            else:
+                mx = 0
+                for t in range(1, k):
+                    if kbuf[t] > kbuf[mx]:
+                        mx = t
+                if d < kbuf[mx]:
+                    kbuf[mx] = d
+        if count == 0:
+            lrd[i] = 1.0
+            continue
+        kdist = kbuf[0]
+        for t in range(1, kcnt):
+            if kbuf[t] > kdist:
+                kdist = kbuf[t]
+        # reach-расстояния первых k валидных соседей в исходном порядке
+        rsum = 0.0
+        taken = 0
+        for j in range(n):
+            if window[j] == p:
+                continue
+            d = abs(window[j] - p)
+            rsum += d if d > kdist else kdist
+            taken += 1
+            if taken == k:
+                break
+        mean_reach = rsum / taken
+        lrd[i] = 1.0 / (mean_reach if mean_reach > eps else eps)
+
+    # k соседей текущей точки: минимум по (расстояние, индекс), как stable-сортировка
+    ksel = k if k < n else n
+    used = np.zeros(n, dtype=np.bool_)
+    s = 0.0
+    for _ in range(ksel):
+        best = -1
+        for j in range(n):
+            if used[j]:
+                continue
+            if best == -1 or abs(window[j] - last) < abs(window[best] - last):
+                best = j
+        used[best] = True
+        s += lrd[best]
+    return s / ksel, lrd[n]
+
+
+if njit is not None:
+    _lof_lrds_kernel = njit(cache=True)(_lof_lrds_kernel)
+
+
+def lof_score(data, window_size=LOF_WINDOW_SIZE) -> float:
+    """LOF-оценка текущей точки (отношение плотностей); 0.0 на страж-случаях.
+
+    Вынесена из lof(), чтобы перебор порогов (grid search) считал
+    плотности один раз и сравнивал готовую оценку с каждым порогом.
+    """
+    arr = np.asarray(data)
+    if arr.size <= window_size: return 0.0
+    window = arr[-window_size - 1:-1]
+    last_value = arr[-1]
+
+    # Проверка константного окна через min/max: два C-прохода без временных
+    # массивов np.abs(...) и в точности та же семантика отклонений от window[0]
+    first = window[0]
+    if (window.max() - first < EPS and first - window.min() < EPS
+            and abs(last_value - first) < EPS):
+        return 0.0
+
+    window64 = window.astype(np.float64, copy=False)
+
+    # Скомпилированное ядро, если numba доступна: без матрицы W x W на вызов
+    if njit is not None:
+        knn_mean, lrd_current = _lof_lrds_kernel(window64, float(last_value), K_LOF, EPS)
+        if lrd_current < EPS: return 0.0
+        return knn_mean / lrd_current
+
+    # Плотности для всех точек окна и текущей точки — одной матричной операцией
+    # вместо O(W*k) питоновских циклов на каждый вызов
+    lrds = _local_reach_densities(np.append(window64, np.float64(last_value)), window64)
+    lrd_current = lrds[-1]
+    if lrd_current < EPS: return 0.0
 
-async def fft(data, window_size=FFT_WINDOW_SIZE, score_threshold=FFT_SCORE_THRESHOLD):
-    data_list = list(data)
-    if len(data_list) < window_size: return False
-    window = np.array(data_list[-window_size:])
+    # k ближайших соседей текущей точки: argpartition за O(W) вместо argsort.
+    # При дубликатах расстояний на границе k откатываемся к stable-сортировке,
+    # чтобы выбор совпадал с прежним (младшие индексы среди равных)
+    distances = np.abs(window64 - last_value)
+    if distances.size > K_LOF:
+        k_nearest = np.argpartition(distances, K_LOF - 1)[:K_LOF]
+        kth_dist = distances[k_nearest].max()
+        if np.count_nonzero(distances <= kth_dist) > K_LOF:
+            k_nearest = np.argsort(distances, kind="stable")[:K_LOF]
+    else:
+        k_nearest = np.argsort(distances, kind="stable")[:K_LOF]
+    return lrds[k_nearest].mean() / lrd_current
+
+
+def lof(data, window_size=LOF_WINDOW_SIZE, score_threshold=LOF_SCORE_THRESHOLD):
+    return bool(lof_score(data, window_size) > score_threshold)
+
+
+def _lof_scores_kernel(arr, window_size, k, eps):
+    """LOF-оценки всех позиций ряда; позиции независимы — prange по ним."""
+    n = arr.shape[0]
+    out = np.zeros(n)
+    for j in prange(window_size, n):
+        window = arr[j - window_size:j]
+        last = arr[j]
+        # Тот же страж константного окна, что и в lof_score
+        first = window[0]
+        if (window.max() - first < eps and first - window.min() < eps
+                and abs(last - first) < eps):
+            continue
+        knn_mean, lrd_current = _lof_lrds_kernel(window, last, k, eps)
+        if lrd_current >= eps:
+            out[j] = knn_mean / lrd_current
+    return out
+
+
+if njit is not None:
+    _lof_scores_kernel = njit(cache=True, parallel=True)(_lof_scores_kernel)
+
+
+def lof_batch(data, window_size=LOF_WINDOW_SIZE, score_threshold=LOF_SCORE_THRESHOLD) -> np.ndarray:
+    """Маска LOF-вердиктов для всех позиций ряда — по окну до каждой точки.
+
+    Позиция j эквивалентна lof(data[:j + 1]); первые window_size позиций
+    всегда False. С numba окна обсчитываются параллельно по позициям,
+    без нее — поштучным lof_score (семантика та же, без компиляции).
+    """
+    arr = np.asarray(data, dtype=np.float64)
+    n = arr.size
+    if n <= window_size:
+        return np.zeros(n, dtype=bool)
+    if njit is not None:
+        scores = _lof_scores_kernel(arr, window_size, K_LOF, EPS)
+    else:
+        scores = np.zeros(n)
+        for j in range(window_size, n):
+            scores[j] = lof_score(arr[j - window_size:j + 1], window_size=window_size)
+    return scores > score_threshold
+
+# Кэш окон Хэннинга по длине — не пересоздаем массив на каждый вызов
+_HANN_CACHE: Dict[int, np.ndarray] = {}
+
+# Многоразовые входные буферы FFT по длине окна: вычитание среднего и
+# умножение на окно Хэннинга пишутся in-place, без двух временных
+# массивов на каждый вызов
+_FFT_SCRATCH: Dict[int, np.ndarray] = {}
+
+
+def _hann(n: int) -> np.ndarray:
+    window = _HANN_CACHE.get(n)
+    if window is None:
+        window = _HANN_CACHE[n] = np.hanning(n)
+    return window
+
+
+def _demeaned_hann(window: np.ndarray) -> np.ndarray:
+    """Окно минус среднее, умноженное на окно Хэннинга, в общем буфере.
+
+    Возвращаемый массив переиспользуется между вызовами — потреблять
+    до следующего вызова с той же длиной окна.
+    """
+    n = window.size
+    buf = _FFT_SCRATCH.get(n)
+    if buf is None:
+        buf = _FFT_SCRATCH[n] = np.empty(n, dtype=np.float64)
+    np.subtract(window, window.mean(), out=buf)
+    buf *= _hann(n)
+    return buf
+
+
+def _spectrum_energies(window: np.ndarray):
+    """(энергия высокочастотной полосы, полная энергия) по rfft-спектру.
+
+    rfft считает только неотрицательные частоты (вдвое меньше работы на
+    вещественном входе); полная энергия восстанавливается удвоением
+    парных бинов, так что значения совпадают с прежним полным fft.
+    """
+    n = window.size
+    magnitudes = np.abs(rfft(window))
+    if n % 2 == 0:
+        total = magnitudes[0] + 2.0 * magnitudes[1:-1].sum() + magnitudes[-1]
+    else:
+        total = magnitudes[0] + 2.0 * magnitudes[1:].sum()
+    high = magnitudes[n // 4:n // 2].sum()
+    return high, total
+
+
+def fft(data, window_size=FFT_WINDOW_SIZE, score_threshold=FFT_SCORE_THRESHOLD):
+    arr = np.asarray(data)
+    if arr.size < window_size: return False
+    window = arr[-window_size:]
     # Очистка от постоянной составляющей для лучшего выделения ритма
-    window = window - np.mean(window)
-    window_weighted = window * np.hanning(len(window))
-    magnitudes = np.abs(np.fft.fft(window_weighted))
-    total_energy = np.sum(magnitudes)
+    high, total_energy = _spectrum_energies(_demeaned_hann(window))
     if total_energy < EPS: return False
-    high_freq_ratio = np.sum(magnitudes[len(magnitudes)//4:len(magnitudes)//2]) / total_energy
-    return bool(high_freq_ratio > score_threshold)
+    return bool(high / total_energy > score_threshold)
+
+
+def fft_score_batch(windows) -> np.ndarray:
+    """Вектор высокочастотных отношений для матрицы окон (P, window_size).
+
+    Одна матричная rfft по axis=1 вместо P отдельных трансформ;
+    значения построчно совпадают с отношением из fft() (0.0 на окнах
+    с нулевой энергией). Используется и пакетным детектором, и
+    перебором порогов в grid search.
+    """
+    w = np.asarray(windows, dtype=np.float64)
+    n = w.shape[1]
+    w = (w - w.mean(axis=1, keepdims=True)) * _hann(n)
+    magnitudes = np.abs(rfft(w, axis=1))
+    if n % 2 == 0:
+        total = magnitudes[:, 0] + 2.0 * magnitudes[:, 1:-1].sum(axis=1) + magnitudes[:, -1]
+    else:
+        total = magnitudes[:, 0] + 2.0 * magnitudes[:, 1:].sum(axis=1)
+    high = magnitudes[:, n // 4:n // 2].sum(axis=1)
+    # Та же защита от нулевой энергии, что и в скалярной версии
+    return np.divide(high, total, out=np.zeros_like(high), where=total >= EPS)
+
+
+def fft_batch(windows, score_threshold=FFT_SCORE_THRESHOLD) -> np.ndarray:
+    """Пакетный fft() для матрицы окон (P, window_size) — по окну на канал."""
+    return fft_score_batch(windows) > score_threshold
 
 # ==================== ВНУТРЕННИЕ ХЕЛПЕРЫ ДЛЯ AMMAD ====================
 
@@ -95,69 +446,110 @@ def _get_z_raw(data_list, window_size=Z_SCORE_WINDOW_SIZE) -> float:
 
 def _get_fft_raw(data_list, window_size=FFT_WINDOW_SIZE) -> float:
     if len(data_list) < window_size: return 0.0
-    window = np.array(data_list[-window_size:])
-    window = window - np.mean(window)
-    magnitudes = np.abs(np.fft.fft(window * np.hanning(len(window))))
-    total = np.sum(magnitudes)
-    return np.sum(magnitudes[len(magnitudes)//4:len(magnitudes)//2]) / (total + EPS)
+    window = np.asarray(data_list)[-window_size:]
+    high, total = _spectrum_energies(_demeaned_hann(window))
+    return high / (total + EPS)
 
 # ==================== КЛАСС AMMAD ====================
 
+# Адаптивные веса на основе твоей статистики (Z, LOF, FFT).
+# Таблица общая для всех детекторов — строится один раз при импорте,
+# а не на каждую инстанциацию AMMADDetector.
+_PARAM_WEIGHTS = {
+    # Группа 1: Динамичные/Шумные (приоритет LOF и FFT)
+    "скорость_спо":           (0.2, 0.4, 0.4),
+    "скорость_бурения":       (0.2, 0.4, 0.4),
+    "момент_ротора":          (0.3, 0.4, 0.3),
+    "дмк":                    (0.3, 0.5, 0.2), # Добавили: ДМК часто "дребезжит"
+
+    # Группа 2: Стабильные/Линейные (приоритет Z-score)
+    "глубина":                (0.8, 0.1, 0.1),
+    "вес_на_крюке":           (0.7, 0.2, 0.1),
+    "температура_на_выходе":  (0.8, 0.2, 0.0),
+
+    # Группа 3: Гидравлика (Баланс Z и LOF)
+    "давление_на_входе":      (0.5, 0.4, 0.1),
+    "расход_на_входе":        (0.6, 0.3, 0.1),
+    "уровень_в_емкости":      (0.4, 0.5, 0.1),
+
+    # Группа 4: Осевые параметры (Склонны к вибрациям)
+    "нагрузка":               (0.4, 0.3, 0.3), # Добавили: FFT важен для выявления вибраций долота
+    "обороты_ротора":         (0.4, 0.2, 0.4), # Поправили: FFT подняли до 0.4 для фиксации резонанса
+}
+_DEFAULT_WEIGHTS = (0.4, 0.4, 0.2)
+
+# Нормировочный знаменатель FFT-оценки — константа, не пересчитываем на каждый сэмпл
+_FFT_NORM = FFT_SCORE_THRESHOLD * 1.5 + EPS
+
+
 class AMMADDetector:
+    # Фиксированный набор атрибутов: без __dict__ на инстанс, чтение
+    # атрибутов в detect() идет по слотам
+    __slots__ = (
+        "param_name", "history", "_z_ring", "weights",
+        "_w_z", "_w_lof", "_w_fft", "_limit_min", "_limit_max",
+    )
+
     def __init__(self, param_name: str):
         self.param_name = param_name
-        self.history = deque(maxlen=300)
-        # Адаптивные веса на основе твоей статистики (Z, LOF, FFT)
-        self.param_weights = {
-            # Группа 1: Динамичные/Шумные (приоритет LOF и FFT)
-            "скорость_спо":           (0.2, 0.4, 0.4),
-            "скорость_бурения":       (0.2, 0.4, 0.4),
-            "момент_ротора":          (0.3, 0.4, 0.3),
-            "дмк":                    (0.3, 0.5, 0.2), # Добавили: ДМК часто "дребезжит"
-            
-            # Группа 2: Стабильные/Линейные (приоритет Z-score)
-            "глубина":                (0.8, 0.1, 0.1),
-            "вес_на_крюке":           (0.7, 0.2, 0.1),
-            "температура_на_выходе":  (0.8, 0.2, 0.0),
-            
-            # Группа 3: Гидравлика (Баланс Z и LOF)
-            "давление_на_входе":      (0.5, 0.4, 0.1), 
-            "расход_на_входе":        (0.6, 0.3, 0.1),
-            "уровень_в_емкости":      (0.4, 0.5, 0.1),
-            
-            # Группа 4: Осевые параметры (Склонны к вибрациям)
-            "нагрузка":               (0.4, 0.3, 0.3), # Добавили: FFT важен для выявления вибраций долота
-            "обороты_ротора":         (0.4, 0.2, 0.4), # Поправили: FFT подняли до 0.4 для фиксации резонанса
-        }
-        self.default_weights = (0.4, 0.4, 0.2)
-
-    async def detect(self, value: float, context: Dict) -> bool:
+        # Кольцевой буфер вместо deque: история лежит непрерывным float32-массивом,
+        # и детекторы работают по нему без list(...)-копий на каждый сэмпл
+        self.history = RingBuffer(300)
+        # Отдельное малое кольцо под Z-окно: его инкрементные суммы дают
+        # скользящие mean/std за O(1) вместо полного прохода np.std на сэмпл
+        self._z_ring = RingBuffer(Z_SCORE_WINDOW_SIZE + 1)
+        # Тройка весов (Z, LOF, FFT) фиксирована на весь срок жизни детектора —
+        # разрешаем ее один раз и раскладываем в скаляры, чтобы в detect
+        # не оставалось ни dict-поисков, ни распаковки кортежа
+        self.weights = _PARAM_WEIGHTS.get(param_name, _DEFAULT_WEIGHTS)
+        self._w_z, self._w_lof, self._w_fft = self.weights
+        # Пределы безопасности тоже кэшируем простыми float (±inf при отсутствии),
+        # чтобы проверка на каждом сэмпле была парой сравнений без dict-поисков
+        limits = SAFETY_LIMITS.get(param_name, {})
+        self._limit_min = limits.get("min", float("-inf"))
+        self._limit_max = limits.get("max", float("inf"))
+
+    def detect(self, value: float, context: Dict) -> bool:
         self.history.append(value)
-        h_list = list(self.history)
-        if len(h_list) < 20: return False
-
-        # 1. Проверка лимитов безопасности (база данных)
-        limits = SAFETY_LIMITS.get(self.param_name, {})
-        if "max" in limits and value > limits["max"]: return True
-        if "min" in limits and value < limits["min"]: return True
-
-        # 2. Расчет весов
-        w_z, w_lof, w_fft = self.param_weights.get(self.param_name, self.default_weights)
-        
-        # 3. Нормализация сигналов
-        s_z = 1 / (1 + np.exp(-(_get_z_raw(h_list) - Z_SCORE_THRESHOLD)))
-        s_fft = min(1.0, _get_fft_raw(h_list) / (FFT_SCORE_THRESHOLD * 1.5 + EPS))
-        s_lof = 1.0 if await lof(h_list) else 0.0
-
-        final_score = (s_z * w_z) + (s_lof * w_lof) + (s_fft * w_fft)
-        
-        # 4. Консенсус оригинальных методов (голосование 2 из 3)
+        self._z_ring.append(value)
+        if self.history.filled < 20: return False
+        h_list = self.history.as_array()
+
+        # 1. Проверка лимитов безопасности (кэшированы при инициализации)
+        if value > self._limit_max or value < self._limit_min: return True
+
+        # Инертные каналы (глубина, уровень) подолгу держат одно значение:
+        # при нулевом размахе окна Z, LOF и FFT гарантированно молчат —
+        # выходим сразу, не гоняя FFT и матричный LOF впустую
+        if np.ptp(h_list) < EPS: return False
+
+        # 2. Сырые сигналы считаем по одному разу: из них выводятся и
+        # нормализованные оценки, и голоса консенсуса (раньше LOF гонялся
+        # дважды, а Z/FFT пересчитывали одну и ту же статистику окна)
+        # Z-сигнал из инкрементных сумм кольца — та же семантика, что у
+        # _get_z_raw, но без прохода по окну
+        if self._z_ring.filled == Z_SCORE_WINDOW_SIZE + 1:
+            mean, std = self._z_ring.window_stats()
+            z_raw = 0.0 if std < 0.01 else abs((self._z_ring.last() - mean) / (std + EPS))
+        else:
+            z_raw = 0.0
+        fft_raw = _get_fft_raw(h_list)
+        lof_hit = lof(h_list)
+
+        # math.exp на скаляре на порядок дешевле ufunc-вызова np.exp
+        s_z = 1 / (1 + math.exp(-(z_raw - Z_SCORE_THRESHOLD)))
+        s_fft = min(1.0, fft_raw / _FFT_NORM)
+        s_lof = 1.0 if lof_hit else 0.0
+
+        final_score = (s_z * self._w_z) + (s_lof * self._w_lof) + (s_fft * self._w_fft)
+
+        # 3. Консенсус оригинальных методов (голосование 2 из 3)
         orig_votes = sum([
-            1 if await z_score(h_list) else 0,
-            1 if await lof(h_list) else 0,
-            1 if await fft(h_list) else 0
+            1 if z_raw > Z_SCORE_THRESHOLD else 0,
+            1 if lof_hit else 0,
+            1 if fft_raw > FFT_SCORE_THRESHOLD else 0
         ])
-        
+
         if orig_votes >= 2: return True
         return bool(final_score > AMMAD_SCORE_THRESHOLD)
 
@@ -165,7 +557,7 @@ class AMMADDetector:
 
 _ammad_detectors: Dict[str, AMMADDetector] = {}
 
-async def ammad(data, **kwargs) -> bool:
+def ammad(data, **kwargs) -> bool:
     param_name = kwargs.get("param_name", "unknown")
     context = kwargs.get("context", {})
     if param_name not in _ammad_detectors:
@@ -173,7 +565,7 @@ async def ammad(data, **kwargs) -> bool:
     
     # Берем последнюю точку данных
     current_val = data[-1] if hasattr(data, '__len__') else data
-    return await _ammad_detectors[param_name].detect(current_val, context)
+    return _ammad_detectors[param_name].detect(current_val, context)
 
 METHODS = {
     "z_score": z_score,
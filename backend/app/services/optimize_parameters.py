@@ -0,0 +1,384 @@
+"""Подбор оптимальных window_size/score_threshold для методов обнаружения аномалий.
+
+Перебирает сетку параметров по реальным данным и оценивает каждую ячейку
+по доле найденных аномалий: целевая полоса 1-5%% от записей, идеал ~2.5%%
+(меньше — метод "слепой", больше — шумит). Рекомендованная конфигурация
+сохраняется в JSON рядом со скриптом.
+"""
+
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+try:
+    # Опциональное ускорение сериализации; на скорость перебора не влияет,
+    # но orjson переваривает numpy-скаляры без ручных float()-приведений
+    import orjson
+except ImportError:
+    orjson = None
+
+# Добавляем путь к корневой директории проекта
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from app.methods import METHODS, lof_score, fft_score_batch, ammad
+from app.utils.data_utils import parse_data, filter_required_parameters
+
+DEFAULT_FILENAME = "../data/default.TXT"
+CONFIG_FILENAME = "recommended_config.json"
+
+# Сетка перебора
+WINDOW_SIZES = [20, 30, 50, 64, 100]
+Z_SCORE_THRESHOLDS = [2.0, 2.5, 3.0, 3.5]
+LOF_THRESHOLDS = [5.0, 10.0, 25.0, 50.0]
+FFT_THRESHOLDS = [0.2, 0.3, 0.4, 0.5]
+
+# Целевая полоса доли аномалий, %
+IDEAL_PERCENTAGE = 2.5
+
+
+class ResultTable:
+    """Результаты перебора как параллельные колонки (SoA), а не список объектов.
+
+    Числовые колонки отдаются наружу np.ndarray-ями: выбор лучшей ячейки —
+    это argmax по колонке score, без прохода по объектам с доступом к
+    атрибутам на каждую ячейку.
+    """
+
+    __slots__ = ("method", "window_size", "score_threshold",
+                 "anomalies", "processed", "anomaly_percentage")
+
+    def __init__(self):
+        self.method = []
+        self.window_size = []
+        self.score_threshold = []
+        self.anomalies = []
+        self.processed = []
+        self.anomaly_percentage = []
+
+    def __len__(self):
+        return len(self.method)
+
+    def add(self, method: str, window_size: int, score_threshold: float,
+            anomalies: int, processed: int):
+        self.method.append(method)
+        self.window_size.append(window_size)
+        self.score_threshold.append(score_threshold)
+        self.anomalies.append(anomalies)
+        self.processed.append(processed)
+        self.anomaly_percentage.append(anomalies / processed * 100.0)
+
+    def extend(self, other: "ResultTable"):
+        for name in self.__slots__:
+            getattr(self, name).extend(getattr(other, name))
+
+    def score_column(self) -> np.ndarray:
+        """Оценки всех ячеек одним np.where-выражением, без вызова на ячейку."""
+        return score_grid(
+            np.asarray(self.anomaly_percentage, dtype=np.float64),
+            np.asarray(self.window_size, dtype=np.float64),
+        )
+
+
+def score_grid(pct: np.ndarray, window_size: np.ndarray) -> np.ndarray:
+    """Оценка ячеек сетки: пик на IDEAL_PERCENTAGE, штраф за большое окно.
+
+    Векторная форма по всей сетке сразу — удобна и для выбора лучшей
+    ячейки через argmax, и для осмотра всего ландшафта оценок.
+    """
+    base = np.where(
+        pct < 1.0, pct,
+        np.where(pct > 5.0, 10.0 - pct, 10.0 - np.abs(pct - IDEAL_PERCENTAGE) * 2.0),
+    )
+    return base - window_size / 100.0
+
+
+def load_param_data(df: pd.DataFrame) -> dict:
+    """Колонки без пропусков, кроме времени, как непрерывные float64-массивы.
+
+    Строится один раз в run_parameter_optimization и передается во все
+    четыре перебора — без четырехкратной конвертации и упаковки значений
+    в питоновские float.
+    """
+    return {
+        col: df[col].dropna().to_numpy(dtype=np.float64)
+        for col in df.columns
+        if col.lower() != "время"
+    }
+
+
+def windows_of(values, window_size: int) -> np.ndarray:
+    """Матрица скользящих окон (N - w, w + 1) без копирования.
+
+    Строка j — значения values[j:j+w+1]: окно из w точек плюс текущая.
+    Это stride-view над исходным массивом, а не O(N*w) срезов-списков.
+    """
+    arr = np.asarray(values, dtype=np.float64)
+    return np.lib.stride_tricks.sliding_window_view(arr, window_size + 1)
+
+
+def optimize_z_score(param_data: dict) -> ResultTable:
+    """Перебор (window_size, threshold) для Z-score.
+
+    Скользящие mean/std считаются один раз на пару (колонка, окно) из
+    кумулятивных сумм и переиспользуются всеми порогами: решение
+    |x - mu| > t * sigma выводится булевой маской по всему ряду сразу,
+    без повызовного пересчета статистик окна.
+    """
+    print("🔧 Оптимизация Z-score...")
+    results = ResultTable()
+
+    for window_size in WINDOW_SIZES:
+        # (anomalies, processed) на порог — общие на все колонки
+        counts = {t: [0, 0] for t in Z_SCORE_THRESHOLDS}
+        w = window_size
+        for values in param_data.values():
+            n = len(values)
+            if n <= w:
+                continue
+            # Скользящие суммы через кумулятивные: окно сдвигается на один
+            # элемент за O(1) арифметики, без объектов pandas.rolling.
+            # Статистики окна из w значений ДО текущего (как в z_score)
+            arr = np.asarray(values, dtype=np.float64)
+            c1 = np.concatenate(([0.0], np.cumsum(arr)))
+            c2 = np.concatenate(([0.0], np.cumsum(arr * arr)))
+            mu = (c1[w:n] - c1[:n - w]) / w
+            var = (c2[w:n] - c2[:n - w]) / w - mu * mu
+            sd = np.sqrt(np.maximum(var, 0.0))
+            dev = np.abs(arr[w:] - mu)
+            live = sd >= 0.01  # защита от "мертвого нуля", как в methods.z_score
+            for t in Z_SCORE_THRESHOLDS:
+                counts[t][0] += int(np.count_nonzero(live & (dev > t * sd)))
+                counts[t][1] += dev.size
+
+        for t in Z_SCORE_THRESHOLDS:
+            anomalies, processed = counts[t]
+            if processed:
+                results.add("z_score", window_size, t, anomalies, processed)
+    return results
+
+
+def _sweep_lof_column(values, window_sizes, thresholds) -> dict:
+    """Полный LOF-перебор одной колонки: {(окно, порог): (аномалий, позиций)}.
+
+    Плотности считаются один раз на позицию: вектор LOF-оценок общий для
+    всех порогов, пороги — это просто сравнения по нему. Функция верхнего
+    уровня, чтобы ProcessPoolExecutor мог ее сериализовать.
+    """
+    out = {}
+    for window_size in window_sizes:
+        if len(values) <= window_size:
+            continue
+        X = windows_of(values, window_size)
+        scores = np.fromiter(
+            (lof_score(row, window_size=window_size) for row in X),
+            dtype=np.float64, count=X.shape[0],
+        )
+        for threshold in thresholds:
+            out[(window_size, threshold)] = (
+                int(np.count_nonzero(scores > threshold)), scores.size,
+            )
+    return out
+
+
+def optimize_lof(param_data: dict) -> ResultTable:
+    """Перебор (window_size, threshold) для LOF.
+
+    Колонки независимы (общих состояний нет, только суммы счетчиков),
+    поэтому перебор раскидывается по процессам — питоновский цикл по
+    позициям не упирается в GIL.
+    """
+    print("🔧 Оптимизация LOF...")
+    counts = {(w, t): [0, 0] for w in WINDOW_SIZES for t in LOF_THRESHOLDS}
+
+    with ProcessPoolExecutor() as executor:
+        futures = [
+            executor.submit(_sweep_lof_column, values, WINDOW_SIZES, LOF_THRESHOLDS)
+            for values in param_data.values()
+        ]
+        for future in as_completed(futures):
+            for key, (anomalies, processed) in future.result().items():
+                counts[key][0] += anomalies
+                counts[key][1] += processed
+
+    results = ResultTable()
+    for (window_size, threshold), (anomalies, processed) in counts.items():
+        if processed:
+            results.add("lof", window_size, threshold, anomalies, processed)
+    return results
+
+
+def optimize_fft(param_data: dict) -> ResultTable:
+    """Перебор (window_size, threshold) для FFT."""
+    print("🔧 Оптимизация FFT...")
+    results = ResultTable()
+
+    for window_size in WINDOW_SIZES:
+        counts = {t: [0, 0] for t in FFT_THRESHOLDS}
+        for values in param_data.values():
+            if len(values) < window_size:
+                continue
+            # fft() смотрит на window_size значений включая текущее;
+            # одна rfft по axis=1 дает отношения сразу для всех позиций,
+            # пороги — сравнения по готовому вектору
+            arr = np.asarray(values, dtype=np.float64)
+            X = np.lib.stride_tricks.sliding_window_view(arr, window_size)
+            scores = fft_score_batch(X)
+            for threshold in FFT_THRESHOLDS:
+                counts[threshold][0] += int(np.count_nonzero(scores > threshold))
+                counts[threshold][1] += scores.size
+
+        for threshold in FFT_THRESHOLDS:
+            anomalies, processed = counts[threshold]
+            if processed:
+                results.add("fft", window_size, threshold, anomalies, processed)
+    return results
+
+
+def optimize_ammad(param_data: dict) -> ResultTable:
+    """Оценка AMMAD в штатной конфигурации.
+
+    AMMAD сам адаптирует веса под параметр и не принимает window_size —
+    сетка здесь вырождается в один прогон потока по каждой колонке.
+    """
+    print("🔧 Оценка AMMAD...")
+    results = ResultTable()
+    anomalies = 0
+    processed = 0
+    for col, values in param_data.items():
+        # Свежая история на колонку: ammad() копит состояние по имени параметра
+        name = f"__opt_{col}"
+        for v in values:
+            if ammad([v], param_name=name):
+                anomalies += 1
+            processed += 1
+    if processed:
+        results.add("ammad", 0, 0.0, anomalies, processed)
+    return results
+
+
+def _timed_sweep(optimizer, param_data: dict):
+    """Запускает один перебор и возвращает (таблица, длительность в сек)."""
+    started = time.perf_counter()
+    result = optimizer(param_data)
+    return result, time.perf_counter() - started
+
+
+def run_parameter_optimization(filename: str = DEFAULT_FILENAME) -> dict:
+    """Полный прогон: загрузка данных, четыре перебора, отчет и сохранение."""
+    file_path = filename
+    if not os.path.exists(file_path):
+        file_path = os.path.join(os.path.dirname(__file__), filename)
+    if not os.path.exists(file_path):
+        print(f"❌ Файл {filename} не найден!")
+        return {}
+
+    with open(file_path, "rb") as f:
+        text = f.read()
+
+    raw = parse_data(text, file_path)
+    if not raw:
+        print("❌ Ошибка парсинга данных.")
+        return {}
+    parsed = filter_required_parameters(raw)
+    df = pd.DataFrame(parsed)
+    # Колонки конвертируются в массивы один раз и шарятся всеми переборами
+    param_data = load_param_data(df)
+    print(f"📊 Загружено {len(df)} записей, {len(param_data)} параметров")
+    print("-" * 50)
+
+    # Четыре перебора независимы — запускаем их одновременно. Потоков
+    # достаточно: LOF почти все время ждет свой пул процессов, z-score и
+    # FFT сидят в numpy (GIL отпускается), и только AMMAD-прогон держит
+    # интерпретатор. Итог ~ максимум по методам, а не сумма.
+    optimizers = (optimize_z_score, optimize_lof, optimize_fft, optimize_ammad)
+    table = ResultTable()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(optimizers)) as pool:
+        futures = [pool.submit(_timed_sweep, opt, param_data) for opt in optimizers]
+        # zip, а не as_completed: порядок строк отчета должен быть стабильным
+        for optimizer, future in zip(optimizers, futures):
+            partial, elapsed = future.result()
+            table.extend(partial)
+            print(f"  ⏱ {optimizer.__name__}: {elapsed:.2f} сек")
+    print(f"  ⏱ все переборы: {time.perf_counter() - started:.2f} сек")
+
+    if not len(table):
+        print("❌ Нет результатов перебора")
+        return {}
+
+    # Отчет по всем ячейкам сетки: форматируем строки сами и печатаем одним
+    # вызовом — без постройки одноразового DataFrame ради to_string
+    header = f"{'Метод':<8} {'Окно':>5} {'Порог':>6} {'Аномалий':>9} {'%':>7} {'Оценка':>7}"
+    lines = ["\n" + "=" * 80, "📊 РЕЗУЛЬТАТЫ ПЕРЕБОРА ПАРАМЕТРОВ", "=" * 80, header]
+    scores_col = table.score_column()
+    for i in range(len(table)):
+        lines.append(
+            f"{table.method[i]:<8} {table.window_size[i]:>5} {table.score_threshold[i]:>6} "
+            f"{table.anomalies[i]:>9} {table.anomaly_percentage[i]:>7.2f} {scores_col[i]:>7.2f}"
+        )
+    print("\n".join(lines))
+
+    # Лучшая ячейка на метод: argmax по колонке score под маской метода
+    methods_col = np.asarray(table.method)
+    config = {}
+    for method in METHODS:
+        idx = np.flatnonzero(methods_col == method)
+        if idx.size == 0:
+            continue
+        best = int(idx[np.argmax(scores_col[idx])])
+        config[method] = {
+            "window_size": table.window_size[best],
+            "score_threshold": table.score_threshold[best],
+            "anomaly_percentage": round(table.anomaly_percentage[best], 3),
+            "score": round(float(scores_col[best]), 3),
+        }
+        print(f"🏆 {method}: окно={table.window_size[best]}, порог={table.score_threshold[best]}, "
+              f"аномалий {table.anomaly_percentage[best]:.2f}%")
+
+    output_path = os.path.join(os.path.dirname(__file__), CONFIG_FILENAME)
+    if orjson is not None:
+        with open(output_path, "wb") as f:  # orjson отдает bytes — файл бинарный
+            f.write(orjson.dumps(
+                config, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY,
+            ))
+    else:
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(config, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Рекомендованная конфигурация сохранена в: {output_path}")
+    return config
+
+
+def visualize_optimization_results(table: "ResultTable", output_file: str = "optimization_results.png"):
+    """Гистограмма доли аномалий по ячейкам сетки (matplotlib опционален)."""
+    try:
+        import matplotlib
+        matplotlib.use("Agg")  # без пробы GUI-бэкендов и fontconfig на сервере
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("⚠️ matplotlib не установлен, визуализация пропущена")
+        return
+
+    labels = [
+        f"{m}\nw={w} t={t}"
+        for m, w, t in zip(table.method, table.window_size, table.score_threshold)
+    ]
+    pcts = table.anomaly_percentage
+    fig, ax = plt.subplots(figsize=(max(8, len(table) * 0.5), 5))
+    ax.bar(labels, pcts)
+    ax.axhline(IDEAL_PERCENTAGE, color="green", linestyle="--", label="идеал")
+    ax.set_ylabel("Доля аномалий, %")
+    ax.legend()
+    fig.tight_layout()
+    path = os.path.join(os.path.dirname(__file__), output_file)
+    fig.savefig(path, dpi=100)
+    plt.close(fig)  # matplotlib держит фигуру в памяти до явного close
+    print(f"💾 График сохранен в: {path}")
+
+
+if __name__ == "__main__":
+    run_parameter_optimization()
@@ -0,0 +1,105 @@
+import os
+import sys
+
+import numpy as np
+
+# Добавляем путь к корневой директории проекта
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from app.methods import z_score_batch, lof, fft, fft_batch, ammad, _ammad_detectors
+
+# Маленькие ручные ряды; проверяемая точка — последняя
+test_data = {
+    "нормальный": [10.0, 10.2, 9.9, 10.1, 10.0, 9.8, 10.1, 10.0, 10.1],
+    "с_аномалией": [10.0, 10.2, 9.9, 10.1, 10.0, 9.8, 10.1, 10.0, 50.0],
+    "тренд": [10.0, 12.0, 14.0, 16.0, 18.0, 20.0, 22.0, 24.0, 26.0],
+    "ступенька": [10.0, 10.0, 10.0, 10.0, 10.0, 30.0, 30.0, 30.0, 30.0],
+}
+
+# Ряды одной длины храним одной непрерывной float32-матрицей (как RingBuffer
+# в проде): детекторам уходят строки-view, без переконвертации списков на
+# каждый из четырех вызовов
+NAMES = list(test_data)
+SERIES = np.asarray(list(test_data.values()), dtype=np.float32)
+
+
+def _make_series(n: int, kind: str, rng) -> np.ndarray:
+    """Синтетический ряд длины n: шумная база плюс дефект того же вида,
+    что и в одноименном ручном ряде (аномалия — в проверяемой точке)."""
+    base = 10.0 + rng.standard_normal(n) * 0.1
+    if kind == "с_аномалией":
+        base[-1] = 50.0
+    elif kind == "тренд":
+        base += np.linspace(0.0, 2.0 * n, n) / n * 8.0
+    elif kind == "ступенька":
+        base[n // 2:] += 20.0
+    return base.astype(np.float32)
+
+
+def quick_test(n: int = 0):
+    """Быстрый прогон всех детекторов по ручным рядам.
+
+    Детекторы — чистый CPU-код, поэтому вызываем их напрямую: никакого
+    event loop, конкурентность на четырех 9-точечных рядах не окупилась бы.
+
+    При n > 0 вместо ручных 9-точечных рядов генерируются синтетические
+    той же формы, но длины n: на них внутренние циклы FFT/LOF получают
+    реальную нагрузку, и прогон годится для профилирования, а не только
+    как смоук.
+    """
+    _ammad_detectors.clear()  # чистое состояние AMMAD между запусками
+
+    if n > 0:
+        rng = np.random.default_rng(42)
+        names = NAMES
+        series = np.stack([_make_series(n, kind, rng) for kind in NAMES])
+    else:
+        names, series = NAMES, SERIES
+
+    # Прогрев всех детекторов на выброшенном ряде: numba-компиляция LOF,
+    # таблицы поворотных множителей FFT (pocketfft кэширует их по длине)
+    # и первые ленивые импорты срабатывают здесь, а не в первом
+    # проверяемом вызове. arange, а не нули — иначе LOF уйдет в ранний
+    # выход по константному окну, не тронув ядро.
+    warm = np.arange(series.shape[1], dtype=np.float32)
+    try:
+        z_score_batch(warm[None, :], window_size=5, score_threshold=2.0)
+        lof(warm, window_size=5, score_threshold=10.0)
+        fft(warm, window_size=8, score_threshold=0.3)
+        ammad(warm, param_name="__warm__")
+    except Exception as e:
+        print(f"⚠️ Прогрев не удался: {e}")
+
+    # Ряды независимы и равной длины — z-score и FFT считаем одним пакетным
+    # вызовом по всей матрице вместо вызова на ряд. LOF и AMMAD пакетных
+    # вариантов не имеют (состояние/плотности на ряд), остаются поштучными.
+    z_results = z_score_batch(series, window_size=5, score_threshold=2.0)
+    fft_results = fft_batch(series[:, -8:], score_threshold=0.3) \
+        if series.shape[1] >= 8 else np.zeros(len(names), dtype=bool)
+
+    # Отчет копим в списке и пишем одним вызовом в конце — по print на
+    # строку это лишние захваты stdout-лока и сбросы буфера
+    lines = ["🚀 Быстрая проверка детекторов"]
+    for i, data_name in enumerate(names):
+        data_values = series[i]  # непрерывная 1-D строка матрицы
+        # round: float32 в tolist() дает длинные хвосты вида 10.199999809
+        shown = [round(v, 2) for v in data_values[-9:].tolist()]
+        suffix = f" (последние 9 из {len(data_values)})" if len(data_values) > 9 else ""
+        lines.append(f"\n📊 Ряд '{data_name}': {shown}{suffix}")
+
+        z_result = z_results[i]
+        lof_result = lof(data_values, window_size=5, score_threshold=10.0)
+        fft_result = fft_results[i]
+        ammad_result = ammad(data_values, param_name=data_name)
+
+        lines.append(f"  z_score: {'🔴 Аномалия' if z_result else '⚪ Норма'}")
+        lines.append(f"  lof:     {'🔴 Аномалия' if lof_result else '⚪ Норма'}")
+        lines.append(f"  fft:     {'🔴 Аномалия' if fft_result else '⚪ Норма'}")
+        lines.append(f"  ammad:   {'🔴 Аномалия' if ammad_result else '⚪ Норма'}")
+
+    print("\n".join(lines))
+
+
+if __name__ == "__main__":
+    # python quick_test.py [n] — n точек на синтетический ряд (0 = ручные)
+    quick_test(int(sys.argv[1]) if len(sys.argv) > 1 else 0)
@@ -1,9 +1,15 @@
-import asyncio
-import pandas as pd
+import os
+import sys
 from collections import deque
-from methods import METHODS, _ammad_detectors 
 
-async def test_all_params():
+import pandas as pd
+
+# Добавляем путь к корневой директории проекта
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from app.methods import METHODS, _ammad_detectors
+
+def test_all_params():
     try:
         df = pd.read_csv('synthetic_tests.csv')
     except FileNotFoundError:
@@ -36,9 +42,9 @@ async def test_all_params():
                 for m_name, m_func in METHODS.items():
                     try:
                         if m_name == "ammad":
-                            res = await m_func(current_data, param_name=p)
+                            res = m_func(current_data, param_name=p)
                         else:
-                            res = await m_func(current_data)
+                            res = m_func(current_data)
                         
                         status = "🔴 ПОЙМАЛ" if res else "⚪ ---"
                         print(f"{p:<22} | {idx:<4} | {m_name:<8} | {status}")
@@ -47,4 +53,4 @@ async def test_all_params():
                 print("-" * 65)
 
 if __name__ == "__main__":
-    asyncio.run(test_all_params())
\ No newline at end of file
+    test_all_params()
\ No newline at end of file
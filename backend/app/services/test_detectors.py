@@ -1,20 +1,45 @@
-import asyncio
 import os
 import sys
-from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
 import pandas as pd
 
 # Добавляем путь к корневой директории проекта
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 # Импортируем компоненты вашего приложения
-from app.methods import METHODS
+from app.methods import (
+    AMMADDetector,
+    METHODS,
+    FFT_WINDOW_SIZE,
+    Z_SCORE_WINDOW_SIZE,
+    fft_batch,
+    lof_batch,
+    z_score_batch,
+)
 from app.utils.data_utils import parse_data, filter_required_parameters
 
 # Константы для теста
 DEFAULT_FILENAME = "../data/default.TXT"
 
-async def run_benchmark():
+
+def _ammad_stream_column(name: str, values: np.ndarray):
+    """Потоковый AMMAD-прогон одной колонки: (имя, число сработок).
+
+    Функция верхнего уровня, чтобы ProcessPoolExecutor мог ее
+    сериализовать; детектор локальный, реестр родительского процесса не
+    трогается. Первые 19 значений, как и раньше, до анализа не доходят
+    (поток начинается с 20-го накопленного значения).
+    """
+    detector = AMMADDetector(name)
+    count = 0
+    for v in values[19:]:
+        if detector.detect(float(v), {}):
+            count += 1
+    return name, count
+
+def run_benchmark():
     print(f"🚀 Загрузка данных из {DEFAULT_FILENAME}...")
     
     # Проверяем существование файла
@@ -36,7 +61,7 @@ async def run_benchmark():
     
     print(f"📄 Файл загружен, размер: {len(text)} байт")
     
-    raw_parsed_data = await parse_data(text, file_path)
+    raw_parsed_data = parse_data(text, file_path)
     if not raw_parsed_data:
         print("❌ Ошибка парсинга данных.")
         return
@@ -55,40 +80,46 @@ async def run_benchmark():
     print(f"🔎 Тестируемые параметры ({len(params)} шт.): {', '.join(params)}")
     print("-" * 50)
 
-    # Инициализация счетчиков и буферов
+    # Инициализация счетчиков
     results = {p: {m: 0 for m in METHODS.keys()} for p in params}
-    buffers = defaultdict(lambda: deque(maxlen=100))
-
-    # 2. Основной цикл анализа (имитация потока)
-    for i, record in enumerate(parsed_data):
-        for key in params:
-            value = record.get(key)
-            if value is None:
-                continue
-                
-            buffers[key].append(value)
-            
-            # Начинаем анализ, когда накопилось достаточно значений
-            if len(buffers[key]) < 20:
-                continue
-
-            for method_name, method_func in METHODS.items():
-                try:
-                    # Подготовка параметров
-                    current_params = {}
-                    if method_name == "ammad":
-                        current_params["param_name"] = key
-                    
-                    # Вызов метода
-                    is_anomaly = await method_func(data=list(buffers[key]), **current_params)
-                    
-                    if is_anomaly:
-                        results[key][method_name] += 1
-                except Exception as e:
-                    print(f"Ошибка в методе {method_name} для {key}: {e}")
-
-        if i % 1000 == 0 and i > 0:
-            print(f"✅ Обработано {i} из {total_records} строк...")
+
+    # Колонки один раз превращаем в непрерывные массивы (None пропускаются,
+    # как и в потоковом цикле ниже)
+    col_arrays = {
+        p: np.asarray(
+            [r[p] for r in parsed_data if r.get(p) is not None], dtype=np.float64,
+        )
+        for p in params
+    }
+
+    # Z-score не требует имитации потока: вердикт в позиции j зависит только
+    # от window_size + 1 последних значений, поэтому все позиции колонки
+    # считаются одним пакетным вызовом по матрице скользящих окон (view,
+    # без копий) — вместо вызова на каждую строку
+    for p in params:
+        arr = col_arrays[p]
+        if arr.size > Z_SCORE_WINDOW_SIZE:
+            wins = np.lib.stride_tricks.sliding_window_view(arr, Z_SCORE_WINDOW_SIZE + 1)
+            results[p]["z_score"] = int(np.count_nonzero(z_score_batch(wins)))
+        # LOF так же позиционно-независим: скомпилированное ядро обходит
+        # все окна колонки разом (параллельно по позициям при наличии numba)
+        results[p]["lof"] = int(np.count_nonzero(lof_batch(arr)))
+        # FFT: одна матричная rfft по всем окнам колонки вместо вызова на строку
+        if arr.size >= FFT_WINDOW_SIZE:
+            wins = np.lib.stride_tricks.sliding_window_view(arr, FFT_WINDOW_SIZE)
+            results[p]["fft"] = int(np.count_nonzero(fft_batch(wins)))
+
+    # 2. Потоковый AMMAD (z_score/lof/fft посчитаны пакетно выше).
+    # Колонки независимы — AMMAD единственный чисто питоновский цикл,
+    # раскидываем его по процессам, как LOF-перебор в grid search
+    with ProcessPoolExecutor() as executor:
+        futures = [
+            executor.submit(_ammad_stream_column, p, col_arrays[p]) for p in params
+        ]
+        for future in as_completed(futures):
+            name, count = future.result()
+            results[name]["ammad"] = count
+            print(f"✅ AMMAD: колонка '{name}' обработана")
 
     # 3. Формирование финального отчета
     report_data = []
@@ -142,4 +173,4 @@ async def run_benchmark():
     print(f"\n💾 Отчет сохранен в: {output_file}")
 
 if __name__ == "__main__":
-    asyncio.run(run_benchmark())
\ No newline at end of file
+    run_benchmark()
\ No newline at end of file
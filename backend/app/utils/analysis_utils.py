@@ -4,13 +4,42 @@ Handles WebSocket communication, parameter management, and data buffering.
 """
 
 import json
-from collections import defaultdict, deque
+import logging
+from collections import defaultdict
 from typing import Dict, Optional, Callable
 
 try:
-    from ..methods import METHODS
+    from ..methods import (
+        METHODS,
+        MIN_WINDOW,
+        RingBuffer,
+        Z_SCORE_THRESHOLD,
+        Z_SCORE_WINDOW_SIZE,
+    )
 except ImportError:
-    from methods import METHODS
+    from methods import (
+        METHODS,
+        MIN_WINDOW,
+        RingBuffer,
+        Z_SCORE_THRESHOLD,
+        Z_SCORE_WINDOW_SIZE,
+    )
+
+
+logger = logging.getLogger(__name__)
+
+
+def min_filled_for(method: str, window_size: int = None) -> Optional[int]:
+    """
+    Minimum number of buffered values at which a method can fire.
+
+    Returns None for methods (AMMAD) that must see every sample.
+    """
+    if method not in MIN_WINDOW:
+        return None
+    ws = window_size if window_size and window_size >= 0 else MIN_WINDOW[method]
+    # z_score и lof смотрят на window_size значений ДО текущего, fft — включая текущее
+    return ws if method == "fft" else ws + 1
 
 
 class AnalysisState:
@@ -20,8 +49,10 @@ class AnalysisState:
         self.method = "fft"  # Метод по умолчанию
         self.window_size = default_window_size
         self.score_threshold = 0.5
-        self.data_buffers: Dict[str, deque] = defaultdict(
-            lambda: deque(maxlen=default_window_size + 1)
+        # Пауза между записями, сек. 0.0 = режим бенчмарка (без троттлинга)
+        self.tick_interval = 0.0
+        self.data_buffers: Dict[str, RingBuffer] = defaultdict(
+            lambda: RingBuffer(default_window_size + 1)
         )
         self.method_params = {
             "window_size": default_window_size,
@@ -47,7 +78,7 @@ class AnalysisState:
             # Clear buffers on method change
             self.data_buffers.clear()
             self.data_buffers = defaultdict(
-                lambda: deque(maxlen=self.window_size + 1)
+                lambda: RingBuffer(self.window_size + 1)
             )
             
             # Для AMMAD метода сбрасываем порог
@@ -74,10 +105,13 @@ class AnalysisState:
             self.window_size = window_size
             self.method_params["window_size"] = window_size
             
-            # Update buffer sizes
+            # Update buffer sizes, keeping the most recent values
             for key in list(self.data_buffers.keys()):
-                old_buffer = list(self.data_buffers[key])
-                self.data_buffers[key] = deque(old_buffer, maxlen=window_size + 1)
+                old_values = self.data_buffers[key].as_array()[-(window_size + 1):]
+                new_buffer = RingBuffer(window_size + 1)
+                for value in old_values:
+                    new_buffer.append(value)
+                self.data_buffers[key] = new_buffer
         
         return True
     
@@ -100,11 +134,42 @@ class AnalysisState:
         
         return True
     
+    def update_tick_interval(self, tick_interval: float) -> bool:
+        """
+        Update delay between streamed records.
+
+        Args:
+            tick_interval: Delay in seconds (0 disables throttling)
+
+        Returns:
+            True if updated, False if invalid
+        """
+        if tick_interval is None or tick_interval < 0:
+            return False
+
+        self.tick_interval = float(tick_interval)
+        return True
+
     def get_method_params(self) -> Dict:
         """Get current method parameters."""
         return self.method_params.copy()
 
 
+def z_score_fast(ring: RingBuffer, window_size: int, score_threshold: float) -> bool:
+    """
+    O(1) Z-score over a ring buffer's incremental sums.
+
+    Equivalent to methods.z_score when the buffer holds exactly
+    window_size values plus the current one; callers must check that.
+    """
+    mean, std = ring.window_stats()
+    # Та же защита от "мертвого нуля", что и в methods.z_score
+    if std < 0.01:
+        return False
+    # Как и в methods.z_score: сравнение через умножение, без деления
+    return abs(ring.last() - mean) > score_threshold * std
+
+
 async def handle_websocket_message(
     message: str,
     analysis_state: AnalysisState,
@@ -123,29 +188,36 @@ async def handle_websocket_message(
     """
     try:
         data = json.loads(message)
-        print(f"[WebSocketHandler] Received message: {data}")
+        logger.debug("[WebSocketHandler] Received message: %s", data)
         
         # Update method
         if "method" in data:
             if not analysis_state.update_method(data["method"]):
-                print(f"[WebSocketHandler] Invalid method: {data['method']}")
+                logger.warning("[WebSocketHandler] Invalid method: %s", data['method'])
                 return False
-            print(f"[WebSocketHandler] Method changed to: {analysis_state.method}")
+            logger.info("[WebSocketHandler] Method changed to: %s", analysis_state.method)
         
         # Update window size
         if "window_size" in data:
             if not analysis_state.update_window_size(data["window_size"]):
-                print(f"[WebSocketHandler] Invalid window size: {data['window_size']}")
+                logger.warning("[WebSocketHandler] Invalid window size: %s", data['window_size'])
                 return False
-            print(f"[WebSocketHandler] Window size changed to: {analysis_state.window_size}")
+            logger.info("[WebSocketHandler] Window size changed to: %s", analysis_state.window_size)
         
         # Update score threshold
         if "score_threshold" in data:
             if not analysis_state.update_score_threshold(data["score_threshold"]):
-                print(f"[WebSocketHandler] Invalid score threshold: {data['score_threshold']}")
+                logger.warning("[WebSocketHandler] Invalid score threshold: %s", data['score_threshold'])
                 return False
-            print(f"[WebSocketHandler] Score threshold changed to: {analysis_state.score_threshold}")
+            logger.info("[WebSocketHandler] Score threshold changed to: %s", analysis_state.score_threshold)
         
+        # Update tick interval (streaming cadence)
+        if "tick_interval" in data:
+            if not analysis_state.update_tick_interval(data["tick_interval"]):
+                logger.warning("[WebSocketHandler] Invalid tick interval: %s", data['tick_interval'])
+                return False
+            logger.info("[WebSocketHandler] Tick interval changed to: %s", analysis_state.tick_interval)
+
         # Legacy parameter updates (for backward compatibility)
         if "FFT" in data and analysis_state.method == "fft":
             analysis_state.update_score_threshold(data["FFT"])
@@ -159,46 +231,105 @@ async def handle_websocket_message(
         return True
     
     except json.JSONDecodeError as e:
-        print(f"[WebSocketHandler] Invalid JSON: {e}")
+        logger.warning("[WebSocketHandler] Invalid JSON: %s", e)
         if on_error:
             on_error(f"Invalid JSON: {e}")
         return False
     except Exception as e:
-        print(f"[WebSocketHandler] Error handling message: {e}")
+        logger.warning("[WebSocketHandler] Error handling message: %s", e)
         if on_error:
             on_error(f"Error: {e}")
         return False
 
 
-async def apply_analysis_method(
+def analyze_record(record: Dict, analysis_state: AnalysisState) -> Dict:
+    """
+    Buffer and analyze all channels of one record in a single call.
+
+    Synchronous: the detectors are pure CPU code, so there is nothing to
+    await. The caller makes one call per tick and receives the
+    ready-to-send frame dict {channel: [value, is_anomaly], "время": ...}.
+
+    Args:
+        record: Parsed data record (channels + "время")
+        analysis_state: Current analysis state
+
+    Returns:
+        Frame dict for the websocket client.
+    """
+    data = {}
+    method = analysis_state.method
+    method_params = analysis_state.get_method_params()
+    min_filled = min_filled_for(method, analysis_state.window_size) or 2
+
+    for key, value in record.items():
+        if key.lower() == "время":
+            data[key] = value
+            continue
+
+        buffer = analysis_state.data_buffers[key]
+        buffer.append(value)
+
+        # Окно еще не заполнено — анализ бессмысленен
+        if len(buffer) < min_filled:
+            data[key] = [value, False]
+            continue
+
+        # Для AMMAD метода передаем имя параметра
+        if method == "ammad":
+            params = {**method_params, "param_name": key}
+        else:
+            params = method_params
+
+        is_anomaly = apply_analysis_method(key, buffer, method, params)
+        data[key] = [value, is_anomaly]
+
+    return data
+
+
+def apply_analysis_method(
     param_name: str,
-    data_buffer: deque,
+    data_buffer: "RingBuffer",
     method: str,
     method_params: Dict
 ) -> bool:
     """
     Apply anomaly detection method to parameter data.
-    
+
     Args:
         param_name: Parameter name (for logging)
-        data_buffer: Deque with parameter values
+        data_buffer: RingBuffer (or any sequence) with parameter values
         method: Method name
         method_params: Method parameters
-    
+
     Returns:
         True if anomaly detected, False otherwise
     """
     if method not in METHODS:
-        print(f"[Analysis] Unknown method: {method}")
+        logger.warning("[Analysis] Unknown method: %s", method)
         return False
-    
+
     if len(data_buffer) < 2:
         return False
-    
+
+    if isinstance(data_buffer, RingBuffer):
+        # Быстрый путь: Z-score по инкрементным суммам без прохода по окну
+        if method == "z_score":
+            window_size = method_params.get("window_size", Z_SCORE_WINDOW_SIZE)
+            if data_buffer.filled == window_size + 1:
+                return z_score_fast(
+                    data_buffer,
+                    window_size,
+                    method_params.get("score_threshold", Z_SCORE_THRESHOLD),
+                )
+        values = data_buffer.as_array()
+    else:
+        values = list(data_buffer)
+
     try:
-        is_anomaly = await METHODS[method](list(data_buffer), **method_params)
+        is_anomaly = METHODS[method](values, **method_params)
         # ПРИНУДИТЕЛЬНОЕ ПРИВЕДЕНИЕ К ОБЫЧНОМУ BOOL
         return bool(is_anomaly) 
     except Exception as e:
-        print(f"[Analysis] Error in {method} for {param_name}: {e}")
+        logger.warning("[Analysis] Error in %s for %s: %s", method, param_name, e)
         return False
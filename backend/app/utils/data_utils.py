@@ -3,9 +3,15 @@ Data utilities for WellPro backend.
 Handles parsing, filtering, and data transformation.
 """
 
-from io import StringIO
+import hashlib
+import pickle
+import tempfile
+from collections import OrderedDict
+from io import BytesIO
 from pathlib import Path
 from typing import Dict, List, Optional
+
+import numpy as np
 import pandas as pd
 
 
@@ -27,7 +33,15 @@ REQUIRED_PARAMETERS = {
 
 
 
-async def parse_data(text: Optional[bytes] = None, filename: str = "data/default.TXT") -> Optional[List[Dict]]:
+def _resolve_data_path(filename: str) -> Path:
+    """Resolve a data filename relative to the app directory."""
+    data_path = Path(filename)
+    if not data_path.is_absolute():
+        data_path = (Path(__file__).resolve().parents[1] / data_path).resolve()
+    return data_path
+
+
+def parse_data(text: Optional[bytes] = None, filename: str = "data/default.TXT") -> Optional[List[Dict]]:
     """
     Parse drilling data from tab-separated file.
     Skips first 2 header rows and extracts data starting from row 3.
@@ -40,32 +54,23 @@ async def parse_data(text: Optional[bytes] = None, filename: str = "data/default
         List of dictionaries with 12 required parameters + time, or None if parsing fails.
     """
     try:
-        if text is None:
-            data_path = Path(filename)
-            if not data_path.is_absolute():
-                data_path = (Path(__file__).resolve().parents[1] / data_path).resolve()
-            with open(data_path, 'rb') as file:
-                text = file.read()
-        
-        # Decode and split lines
-        lines = text.decode("utf-8").strip().split('\n')
-        
         # Line 0: "Начало рейса - ..." (skip)
         # Line 1: "Окончание рейса - ..." (skip)
         # Line 2: Headers
         # Line 3+: Data
-        
-        if len(lines) < 3:
-            print("[DataParser] Error: File has less than 3 lines")
-            return None
-        
-        # Read from line 2 (0-indexed) which is the header row
+        #
+        # Файл скармливается C-парсеру pandas напрямую (skiprows=2) — без
+        # decode, split по строкам и склейки гигантской строки для StringIO:
+        # меньше пикового потребления памяти и один проход по байтам
+        source = BytesIO(text) if text is not None else _resolve_data_path(filename)
         df = pd.read_csv(
-            StringIO('\n'.join(lines[2:])),
+            source,
             sep='\t',
             header=0,
+            skiprows=2,
             decimal=',',
-            dtype=float
+            dtype=float,
+            encoding='utf-8',
         )
         
         # Normalize column names to lowercase
@@ -77,11 +82,24 @@ async def parse_data(text: Optional[bytes] = None, filename: str = "data/default
             print("[DataParser] Error: 'время' column not found")
             print(f"[DataParser] Available columns: {df.columns.tolist()}")
             return None
-        
+
+        total_columns = len(df.columns)
+
+        # Наружу уходят только требуемые параметры + время: не материализуем
+        # записи по всем ~60 колонкам файла ради того, чтобы фильтр дальше
+        # их выбросил — это десятки лишних dict-полей на каждую запись
+        keep = ['время'] + [c for c in df.columns if c in REQUIRED_PARAMETERS]
+        df = df[keep]
+
+        # Каналы ужимаем до float32: вдвое меньше памяти на записи, а
+        # детекторы и так работают во float32 (RingBuffer). 'время' остается
+        # float64 — метки времени крупные, их точность терять нельзя
+        df = df.astype({c: np.float32 for c in df.columns if c != 'время'})
+
         # Convert to records and filter to required parameters
         data = df.to_dict(orient="records")
         print(f"[DataParser] Successfully parsed {len(data)} records")
-        print(f"[DataParser] Found {len(df.columns)} columns, keeping 12 required parameters + time")
+        print(f"[DataParser] Found {total_columns} columns, keeping {len(keep) - 1} required parameters + time")
         
         return data
     
@@ -92,6 +110,86 @@ async def parse_data(text: Optional[bytes] = None, filename: str = "data/default
         return None
 
 
+def load_default_data(filename: str = "data/default.TXT") -> List[Dict]:
+    """
+    Load, parse and filter the default dataset with an on-disk cache.
+
+    The filtered result is pickled to the system temp dir keyed by the
+    source file's mtime and size, so server restarts (and dev reloads)
+    skip re-parsing entirely.
+
+    Args:
+        filename: Data file, relative to the app directory.
+
+    Returns:
+        Filtered data records (empty list if the file cannot be parsed).
+    """
+    data_path = _resolve_data_path(filename)
+    cache_path = None
+    try:
+        stat = data_path.stat()
+        cache_path = Path(tempfile.gettempdir()) / (
+            f"wellpro_default_{stat.st_mtime_ns}_{stat.st_size}.pkl"
+        )
+        if cache_path.exists():
+            with open(cache_path, "rb") as f:
+                data = pickle.load(f)
+            print(f"[DataParser] Loaded {len(data)} records from cache {cache_path.name}")
+            return data
+    except (OSError, pickle.UnpicklingError) as e:
+        print(f"[DataParser] Warning: default data cache unusable: {e}")
+
+    raw = parse_data(None, filename)
+    data = filter_required_parameters(raw) if raw else []
+
+    if cache_path is not None and data:
+        try:
+            with open(cache_path, "wb") as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError as e:
+            print(f"[DataParser] Warning: could not write default data cache: {e}")
+
+    return data
+
+
+# Cache of parsed + filtered uploads keyed by content hash.
+# Re-analyzing the same file (e.g. switching methods in the UI) skips parsing.
+_PARSE_CACHE: "OrderedDict[bytes, List[Dict]]" = OrderedDict()
+_PARSE_CACHE_MAX_SIZE = 32
+
+
+def parse_and_filter_cached(text: bytes, filename: str = "data/default.TXT") -> Optional[List[Dict]]:
+    """
+    Parse and filter file content, memoized on a hash of the raw bytes.
+
+    Args:
+        text: File content as bytes.
+        filename: Fallback filename passed through to parse_data.
+
+    Returns:
+        Filtered data (shared cached instance — callers must not mutate),
+        or None if parsing fails.
+    """
+    key = hashlib.blake2b(text, digest_size=16).digest()
+
+    cached = _PARSE_CACHE.get(key)
+    if cached is not None:
+        _PARSE_CACHE.move_to_end(key)  # LRU: отмечаем как недавно использованный
+        print(f"[DataParser] Cache hit, reusing {len(cached)} parsed records")
+        return cached
+
+    parsed = parse_data(text, filename)
+    if parsed is None:
+        return None
+
+    filtered = filter_required_parameters(parsed)
+    _PARSE_CACHE[key] = filtered
+    if len(_PARSE_CACHE) > _PARSE_CACHE_MAX_SIZE:
+        _PARSE_CACHE.popitem(last=False)
+
+    return filtered
+
+
 def filter_required_parameters(data: List[Dict]) -> List[Dict]:
     """
     Filter data to keep only 12 required parameters and 'время'.